@@ -0,0 +1,357 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum, auto
+from typing import Any, Callable, Iterator, Optional
+
+
+class ErrorAction(Enum):
+    """
+    enum for the handling of a failed request
+    """
+    RETRY = auto()
+    SPLIT = auto()
+    FAIL = auto()
+
+
+_RETRY_STATUS_CODES = {429, 500, 502, 503}
+_SPLIT_STATUS_CODES = {408, 413, 504}
+_RETRY_GRPC_CODES = {'UNAVAILABLE', 'RESOURCE_EXHAUSTED', 'ABORTED'}
+# httpx transport errors, they do not subclass ConnectionError
+_CONNECTION_ERROR_NAMES = {'ConnectError', 'ReadError', 'WriteError', 'CloseError', 'NetworkError',
+                           'RemoteProtocolError'}
+
+
+def _exception_chain(exc: BaseException) -> Iterator[BaseException]:
+    """
+    internal iterate over an exception and the exceptions it wraps
+    :param exc: the exception to start from
+    :return: generator of the exceptions
+    """
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        yield exc
+        # qdrant_client wraps transport errors in ResponseHandlingException.source
+        exc = getattr(exc, 'source', None) or exc.__cause__ or exc.__context__
+
+
+def _grpc_code(exc: BaseException) -> Optional[str]:
+    """
+    internal the name of the status code of a grpc error
+    :param exc: the exception to check
+    :return: the code name or None if it is not a grpc error
+    """
+    code = getattr(exc, 'code', None)
+    return getattr(code(), 'name', None) if callable(code) else None
+
+
+def _is_timeout(exc: BaseException) -> bool:
+    """
+    internal check if an exception or any exception it wraps is a timeout
+    :param exc: the exception to check
+    :return: True if it is caused by a timeout
+    """
+    return any(isinstance(e, TimeoutError) or 'Timeout' in type(e).__name__ or _grpc_code(e) == 'DEADLINE_EXCEEDED'
+               for e in _exception_chain(exc))
+
+
+def _is_connection_error(exc: BaseException) -> bool:
+    """
+    internal check if an exception or any exception it wraps is a connection error
+    :param exc: the exception to check
+    :return: True if it is caused by a refused, reset or dropped connection
+    """
+    return any(isinstance(e, ConnectionError) or type(e).__name__ in _CONNECTION_ERROR_NAMES
+               for e in _exception_chain(exc))
+
+
+def classify_error(exc: BaseException) -> ErrorAction:
+    """
+    decide how a failed request should be handled, based on the http status, the grpc code
+    or the exception type, so the qdrant client modules do not have to be imported
+    :param exc: the exception raised by the request
+    :return: split the batch for timeouts and too large requests, retry for overload and
+     connection errors, otherwise fail
+    """
+    status_code = getattr(exc, 'status_code', None)
+    if status_code in _SPLIT_STATUS_CODES or _is_timeout(exc):
+        return ErrorAction.SPLIT
+    if status_code in _RETRY_STATUS_CODES or _is_connection_error(exc) or _grpc_code(exc) in _RETRY_GRPC_CODES:
+        return ErrorAction.RETRY
+    return ErrorAction.FAIL
+
+
+class AdaptiveController:
+    """
+    controls the batch size and the number of in-flight requests sent to qdrant;
+    failed requests are retried with jittered exponential backoff, timed out or too large
+    batches are split, and the batch size and concurrency are tuned AIMD-style:
+    increased additively while the latency stays under the target, decreased
+    multiplicatively on slow responses and errors; slow requests decrease the batch size
+    until it reaches its minimum and the concurrency afterwards; like a congestion window the
+    limits are decreased at most once per window, i.e. only by requests started after the last decrease
+    """
+
+    def __init__(self, batch_size: int = 256, min_batch_size: int = 1, max_batch_size: int = 4096,
+                 batch_size_step: int = 64, concurrency: int = 2, max_concurrency: int = 8,
+                 target_latency: float = 1.0, decrease_factor: float = 0.5, max_retries: int = 5,
+                 backoff_base: float = 0.1, backoff_max: float = 10.0,
+                 classify: Callable[[BaseException], ErrorAction] = classify_error,
+                 sleep: Callable[[float], None] = time.sleep) -> None:
+        """
+        create an adaptive controller
+        :param batch_size: the initial number of items per request
+        :param min_batch_size: the lower limit of the batch size
+        :param max_batch_size: the upper limit of the batch size
+        :param batch_size_step: the additive increase of the batch size after a fast request
+        :param concurrency: the initial number of requests in flight
+        :param max_concurrency: the upper limit of the requests in flight
+        :param target_latency: request latency in seconds above which the batch size is decreased
+        :param decrease_factor: the multiplicative decrease of the batch size and concurrency
+        :param max_retries: the number of retries of a request before the error is raised
+        :param backoff_base: the backoff in seconds of the first retry, doubled on each retry
+        :param backoff_max: the upper limit of the backoff in seconds
+        :param classify: function deciding whether a failed request is retried, split or failed
+        :param sleep: function used to wait between retries
+        """
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max_batch_size
+        self.batch_size_step = batch_size_step
+        self.max_concurrency = max_concurrency
+        self.target_latency = target_latency
+        self.decrease_factor = decrease_factor
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._classify = classify
+        self._sleep = sleep
+        self._batch_size = min(max(batch_size, min_batch_size), max_batch_size)
+        self._concurrency = min(max(concurrency, 1), max_concurrency)
+        self._in_flight = 0
+        self._condition = threading.Condition()
+        self._executor = None
+        self._counters = {'requests': 0, 'retries': 0, 'splits': 0, 'errors': 0}
+        self._last_latency = None
+        self._avg_latency = None
+        self._last_decrease = float('-inf')
+
+    @property
+    def batch_size(self) -> int:
+        """
+        the current number of items per request
+        """
+        return self._batch_size
+
+    @property
+    def concurrency(self) -> int:
+        """
+        the current number of requests allowed in flight
+        """
+        return self._concurrency
+
+    def _backoff(self, attempt: int) -> float:
+        """
+        internal full jitter exponential backoff
+        :param attempt: the number of the retry, starting from 1
+        :return: the seconds to wait
+        """
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+
+    def _can_decrease(self, started: float) -> bool:
+        """
+        internal check if a slow or failed request may decrease the limits, only one of the requests in
+        flight during a decrease is allowed to do it, so one overload episode halves the limits only once
+        :param started: the start time of the request
+        :return: True if the request started after the last decrease
+        """
+        if started < self._last_decrease:
+            return False
+        self._last_decrease = time.monotonic()
+        return True
+
+    def _on_success(self, latency: float, tune_batch_size: bool, started: float = None) -> None:
+        """
+        internal record a successful request and increase the limits if it was fast enough
+        :param latency: the latency of the request in seconds
+        :param tune_batch_size: whether the batch size should be tuned from the latency
+        :param started: the start time of the request, defaults to now minus the latency
+        :return:
+        """
+        if started is None:
+            started = time.monotonic() - latency
+        with self._condition:
+            self._counters['requests'] += 1
+            self._last_latency = latency
+            self._avg_latency = latency if self._avg_latency is None else 0.8 * self._avg_latency + 0.2 * latency
+            if latency > self.target_latency:
+                if self._can_decrease(started):
+                    if tune_batch_size and self._batch_size > self.min_batch_size:
+                        self._batch_size = max(self.min_batch_size, int(self._batch_size * self.decrease_factor))
+                    else:
+                        self._concurrency = max(1, int(self._concurrency * self.decrease_factor))
+            elif not tune_batch_size or self._batch_size >= self.max_batch_size:
+                self._concurrency = min(self.max_concurrency, self._concurrency + 1)
+            else:
+                self._batch_size = min(self.max_batch_size, self._batch_size + self.batch_size_step)
+            self._condition.notify_all()
+
+    def _on_error(self, action: ErrorAction, tune_batch_size: bool, started: float) -> None:
+        """
+        internal record a failed request and decrease the limits
+        :param action: how the failure is handled
+        :param tune_batch_size: whether the batch size should be decreased as well
+        :param started: the start time of the request
+        :return:
+        """
+        with self._condition:
+            self._counters['errors'] += 1
+            if action == ErrorAction.FAIL or not self._can_decrease(started):
+                return
+            self._concurrency = max(1, int(self._concurrency * self.decrease_factor))
+            if tune_batch_size and action == ErrorAction.SPLIT:
+                self._batch_size = max(self.min_batch_size, int(self._batch_size * self.decrease_factor))
+
+    def _acquire(self) -> None:
+        """
+        internal wait until a request is allowed to be sent
+        :return:
+        """
+        with self._condition:
+            while self._in_flight >= self._concurrency:
+                self._condition.wait()
+            self._in_flight += 1
+
+    def _release(self) -> None:
+        """
+        internal mark a request as finished
+        :return:
+        """
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def call(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        run a single request, e.g. a search, with retries and backoff;
+        as it can not be split every retryable error is retried
+        :param fn: the request function
+        :return: the result of the request
+        """
+        attempt = 0
+        while True:
+            self._acquire()
+            start = time.monotonic()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as exc:
+                action = self._classify(exc)
+                self._on_error(action, tune_batch_size=False, started=start)
+                attempt += 1
+                if action == ErrorAction.FAIL or attempt > self.max_retries:
+                    raise
+            else:
+                self._on_success(time.monotonic() - start, tune_batch_size=False, started=start)
+                return result
+            finally:
+                self._release()
+            with self._condition:
+                self._counters['retries'] += 1
+            self._sleep(self._backoff(attempt))
+
+    def _send(self, fn: Callable[[list], Any], batch: list) -> None:
+        """
+        internal send a batch, split it on timeouts and too large requests and retry other errors;
+        splitting does not use up retries, a batch is split down to the minimum batch size and
+        each half has its own retries
+        :param fn: the function sending a batch
+        :param batch: the items to send
+        :return:
+        """
+        attempt = 0
+        while True:
+            start = time.monotonic()
+            try:
+                fn(batch)
+            except Exception as exc:
+                action = self._classify(exc)
+                self._on_error(action, tune_batch_size=True, started=start)
+                split = action == ErrorAction.SPLIT and len(batch) > self.min_batch_size
+                if not split:
+                    attempt += 1
+                    if action == ErrorAction.FAIL or attempt > self.max_retries:
+                        raise
+            else:
+                self._on_success(time.monotonic() - start, tune_batch_size=True, started=start)
+                return
+            if split:
+                with self._condition:
+                    self._counters['splits'] += 1
+                self._sleep(self._backoff(1))
+                middle = len(batch) // 2
+                self._send(fn, batch[:middle])
+                self._send(fn, batch[middle:])
+                return
+            with self._condition:
+                self._counters['retries'] += 1
+            self._sleep(self._backoff(attempt))
+
+    def _send_slot(self, fn: Callable[[list], Any], batch: list) -> None:
+        """
+        internal send a batch in an acquired slot and release the slot afterwards
+        :return:
+        """
+        try:
+            self._send(fn, batch)
+        finally:
+            self._release()
+
+    def run_batches(self, fn: Callable[[list], Any], items: list) -> None:
+        """
+        send the items in batches of the current batch size with at most the current concurrency
+        of requests in flight; the limits are shared by all callers of the controller
+        :param fn: the function sending a batch
+        :param items: the items to send
+        :return:
+        """
+        if self._executor is None:
+            with self._condition:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+        futures = []
+        position = 0
+        while position < len(items):
+            self._acquire()
+            if any(future.done() and future.exception() for future in futures):
+                self._release()
+                break
+            batch = items[position:position + self._batch_size]
+            position += len(batch)
+            futures.append(self._executor.submit(self._send_slot, fn, batch))
+        for future in futures:
+            future.result()
+
+    def stats(self) -> dict[str, Any]:
+        """
+        the current settings and counters of the controller
+        :return: dict of the batch size, concurrency, in-flight requests, latencies and counters
+        """
+        with self._condition:
+            return {
+                'batch_size': self._batch_size,
+                'concurrency': self._concurrency,
+                'in_flight': self._in_flight,
+                'last_latency': self._last_latency,
+                'avg_latency': self._avg_latency,
+                **self._counters,
+            }
+
+    def close(self) -> None:
+        """
+        shut down the threads sending the batches
+        :return:
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
@@ -0,0 +1,21 @@
+from collections import deque
+from concurrent.futures import Executor
+from typing import Any, Iterable, Iterator
+
+
+def bounded_map(executor: Executor, tasks: Iterable[tuple], max_in_flight: int) -> Iterator[Any]:
+    """
+    run (function, args) tasks on an executor keeping at most max_in_flight pending,
+    so large inputs are not read into memory ahead of the consumers
+    :param executor: the executor to run the tasks on
+    :param tasks: iterable of (function, args) tuples
+    :param max_in_flight: the maximum number of submitted but not consumed tasks
+    :return: generator of the task results in submission order
+    """
+    pending = deque()
+    for fn, args in tasks:
+        if len(pending) >= max_in_flight:
+            yield pending.popleft().result()
+        pending.append(executor.submit(fn, *args))
+    while pending:
+        yield pending.popleft().result()
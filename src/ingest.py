@@ -0,0 +1,344 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, Optional
+
+import numpy as np
+
+from qdrant_connector.src.data.index import IndexConfig
+from qdrant_connector.src.executor_utils import bounded_map
+from qdrant_connector.src.qdrant_connection_params import QdrantConnectionParams, ConnType
+from qdrant_connector.src.qdrant_connector import QdrantConnector
+
+
+class IngestStats:
+    """
+    helper class to track the progress and throughput of an ingest run
+    """
+
+    def __init__(self) -> None:
+        """
+        create an empty stats object, the clock starts on creation
+        """
+        self.rows = 0
+        self.batches = 0
+        self.started = time.monotonic()
+
+    def add_batch(self, rows: int) -> None:
+        """
+        record an upserted batch
+        :param rows: the number of rows in the batch
+        :return:
+        """
+        self.rows += rows
+        self.batches += 1
+
+    def elapsed(self) -> float:
+        """
+        the seconds passed since the ingest was started
+        :return: elapsed seconds
+        """
+        return time.monotonic() - self.started
+
+    def throughput(self) -> float:
+        """
+        the average number of rows upserted per second
+        :return: rows per second
+        """
+        elapsed = self.elapsed()
+        return self.rows / elapsed if elapsed > 0 else 0.0
+
+    def __str__(self) -> str:
+        """
+        helper method to print the internals
+        :return:
+        """
+        return f"rows: {self.rows}, batches: {self.batches}, elapsed: {self.elapsed():.1f}s, " \
+               f"throughput: {self.throughput():.1f} rows/s"
+
+
+class PointBatch:
+    """
+    helper class holding a compact batch of parsed rows, the vectors are a contiguous float32 array
+    so the batch is cheap to send from the worker processes
+    """
+
+    def __init__(self, ids: list, vectors: np.ndarray, payloads: list[dict]) -> None:
+        """
+        create a point batch
+        :param ids: the object ids of the rows
+        :param vectors: 2d float32 array of the vectors of the rows
+        :param payloads: the payload of each row, without the object id and vector fields
+        """
+        self.ids = ids
+        self.vectors = vectors
+        self.payloads = payloads
+
+    def __len__(self) -> int:
+        """
+        the number of rows in the batch
+        :return:
+        """
+        return len(self.ids)
+
+
+def _convert_rows(rows: Iterable[dict], id_field: str, vector_field: str, source: str,
+                  first_row: int = 1) -> PointBatch:
+    """
+    internal convert parsed rows into a point batch
+    :param rows: the parsed rows as dicts
+    :param id_field: the name of the row field holding the object id
+    :param vector_field: the name of the row field holding the vector
+    :param source: the input file of the rows, used in error messages
+    :param first_row: the row number of the first row in the input file, used in error messages
+    :return: the point batch
+    """
+    ids, vectors, payloads = [], [], []
+    for row_number, row in enumerate(rows, start=first_row):
+        for field in (id_field, vector_field):
+            if row.get(field) is None:
+                raise ValueError(f"{source}, row {row_number}: missing field '{field}'")
+        ids.append(row.pop(id_field))
+        vectors.append(row.pop(vector_field))
+        payloads.append(row)
+    try:
+        array = np.asarray(vectors, dtype=np.float32)
+    except ValueError as exc:
+        raise ValueError(f"{source}, rows {first_row}-{first_row + len(ids) - 1}: "
+                         f"vectors are not numeric or not of the same size") from exc
+    return PointBatch(ids=ids, vectors=array, payloads=payloads)
+
+
+def parse_jsonl_lines(lines: list[str], id_field: str = "id", vector_field: str = "vector",
+                      source: str = "", first_line: int = 1) -> PointBatch:
+    """
+    parse a chunk of jsonl lines into a point batch, runs in a worker process
+    :param lines: the raw lines of the chunk, blank lines are skipped
+    :param id_field: the name of the row field holding the object id
+    :param vector_field: the name of the row field holding the vector
+    :param source: the input file of the lines, used in error messages
+    :param first_line: the line number of the first line in the input file, used in error messages
+    :return: the point batch
+    """
+    rows = []
+    for line_number, line in enumerate(lines, start=first_line):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as exc:
+            raise ValueError(f"{source}, line {line_number}: invalid json: {exc}") from exc
+        if not isinstance(row, dict):
+            raise ValueError(f"{source}, line {line_number}: expected a json object per line")
+        rows.append(row)
+    return _convert_rows(rows, id_field=id_field, vector_field=vector_field, source=source, first_row=first_line)
+
+
+def parse_parquet_row_group(path: str, row_group: int, id_field: str = "id",
+                            vector_field: str = "vector") -> PointBatch:
+    """
+    read and convert one parquet row group into a point batch, runs in a worker process
+    :param path: the path of the parquet file
+    :param row_group: the index of the row group to read
+    :param id_field: the name of the column holding the object id
+    :param vector_field: the name of the column holding the vector
+    :return: the point batch
+    """
+    import pyarrow.parquet as pq
+    parquet_file = pq.ParquetFile(path)
+    first_row = sum(parquet_file.metadata.row_group(i).num_rows for i in range(row_group)) + 1
+    rows = parquet_file.read_row_group(row_group).to_pylist()
+    return _convert_rows(rows, id_field=id_field, vector_field=vector_field, source=path, first_row=first_row)
+
+
+def parse_npy_slice(path: str, start: int, stop: int, id_offset: int = 0) -> PointBatch:
+    """
+    read a slice of a 2d npy vector array into a point batch, runs in a worker process;
+    the object id of a row is its position in the file plus the id offset
+    :param path: the path of the npy file
+    :param start: the first row of the slice
+    :param stop: the row after the last row of the slice
+    :param id_offset: value added to the row position to get the object id
+    :return: the point batch
+    """
+    vectors = np.ascontiguousarray(np.load(path, mmap_mode='r')[start:stop], dtype=np.float32)
+    return PointBatch(ids=list(range(id_offset + start, id_offset + stop)), vectors=vectors,
+                      payloads=[{} for _ in range(stop - start)])
+
+
+def _jsonl_tasks(path: str, batch_size: int, id_field: str, vector_field: str) -> Iterator[tuple]:
+    """
+    internal split a jsonl file into parse tasks of batch_size lines
+    :return: generator of (function, args) tuples
+    """
+    with open(path, encoding='utf-8') as f:
+        lines = []
+        first_line = 1
+        for line_number, line in enumerate(f, start=1):
+            lines.append(line)
+            if len(lines) >= batch_size:
+                yield parse_jsonl_lines, (lines, id_field, vector_field, path, first_line)
+                lines = []
+                first_line = line_number + 1
+        if lines:
+            yield parse_jsonl_lines, (lines, id_field, vector_field, path, first_line)
+
+
+def _parquet_tasks(path: str, id_field: str, vector_field: str) -> Iterator[tuple]:
+    """
+    internal split a parquet file into parse tasks, one per row group
+    :return: generator of (function, args) tuples
+    """
+    import pyarrow.parquet as pq
+    for row_group in range(pq.ParquetFile(path).num_row_groups):
+        yield parse_parquet_row_group, (path, row_group, id_field, vector_field)
+
+
+def _npy_tasks(path: str, rows: int, batch_size: int, id_offset: int) -> Iterator[tuple]:
+    """
+    internal split an npy file into parse tasks of batch_size rows
+    :return: generator of (function, args) tuples
+    """
+    for start in range(0, rows, batch_size):
+        yield parse_npy_slice, (path, start, min(start + batch_size, rows), id_offset)
+
+
+def input_tasks(paths: list[str], batch_size: int = 1000, id_field: str = "id", vector_field: str = "vector",
+                id_offset: int = 0) -> Iterator[tuple]:
+    """
+    split the input files into parse tasks based on the file extension (.jsonl, .ndjson, .parquet, .npy)
+    :param paths: the list of input files
+    :param batch_size: the number of rows per task for jsonl and npy, parquet uses its row groups
+    :param id_field: the name of the field holding the object id
+    :param vector_field: the name of the field holding the vector
+    :param id_offset: object id of the first row of the first npy file, the rows of the following
+     npy files get the next ids so they do not overwrite each other
+    :return: generator of (function, args) tuples to be run in the worker processes
+    """
+    for path in paths:
+        extension = os.path.splitext(path)[1].lower()
+        if extension in ('.jsonl', '.ndjson'):
+            yield from _jsonl_tasks(path, batch_size, id_field, vector_field)
+        elif extension in ('.parquet', '.pq'):
+            yield from _parquet_tasks(path, id_field, vector_field)
+        elif extension == '.npy':
+            rows = np.load(path, mmap_mode='r').shape[0]
+            yield from _npy_tasks(path, rows, batch_size, id_offset)
+            id_offset += rows
+        else:
+            raise ValueError(f"unsupported input file type: {path}")
+
+
+def ingest(connector: QdrantConnector, index_name: str, paths: list[str], batch_size: int = 1000,
+           id_field: str = "id", vector_field: str = "vector", id_offset: int = 0, workers: int = None,
+           upsert_workers: int = 2, progress: Optional[Callable[[IngestStats], None]] = None) -> IngestStats:
+    """
+    ingest input files into an index; rows are parsed and converted into compact point batches in
+    a process pool and the batches are upserted by a small thread pool over the connector
+    :param connector: the connector to upsert with
+    :param index_name: the name of the index to write into, it has to exist
+    :param paths: the list of jsonl, parquet or npy input files
+    :param batch_size: the number of rows per parse task and upsert batch
+    :param id_field: the name of the field holding the object id
+    :param vector_field: the name of the field holding the vector
+    :param id_offset: object id of the first row of the first npy file, the following npy files continue from it
+    :param workers: the number of parse processes, defaults to the cpu count
+    :param upsert_workers: the number of upsert threads; with more than one the batches are upserted
+     concurrently, so for an id repeated across batches the last write in the input is not guaranteed,
+     with one the batches are upserted in input order
+    :param progress: optional callback called with the stats after each upserted batch
+    :return: the stats of the run
+    """
+    stats = IngestStats()
+    workers = workers or os.cpu_count() or 1
+    tasks = input_tasks(paths, batch_size=batch_size, id_field=id_field, vector_field=vector_field,
+                        id_offset=id_offset)
+    with ProcessPoolExecutor(max_workers=workers) as parse_pool, \
+            ThreadPoolExecutor(max_workers=upsert_workers) as upsert_pool:
+        upserts = ((_upsert_and_count, (connector, batch, index_name))
+                   for batch in bounded_map(parse_pool, tasks, max_in_flight=workers * 2))
+        for rows in bounded_map(upsert_pool, upserts, max_in_flight=upsert_workers * 2):
+            stats.add_batch(rows)
+            if progress:
+                progress(stats)
+    return stats
+
+
+def _upsert_and_count(connector: QdrantConnector, batch: PointBatch, index_name: str) -> int:
+    """
+    internal upsert a batch and return its size
+    :return: the number of rows upserted
+    """
+    if len(batch):
+        connector._upsert_batch(ids=batch.ids, vectors=batch.vectors, payloads=batch.payloads,
+                                index_name=index_name)
+    return len(batch)
+
+
+def _progress_printer(every: int) -> Callable[[IngestStats], None]:
+    """
+    internal create a progress callback printing the stats to stderr every given number of batches
+    :param every: print after this many batches
+    :return: the callback
+    """
+    def report(stats: IngestStats) -> None:
+        if stats.batches % every == 0:
+            print(stats, file=sys.stderr, flush=True)
+    return report
+
+
+def _parse_args(argv: list[str] = None) -> argparse.Namespace:
+    """
+    internal parse the command line arguments
+    :param argv: the arguments, defaults to sys.argv
+    :return: the parsed arguments
+    """
+    parser = argparse.ArgumentParser(prog="python -m qdrant_connector.src.ingest",
+                                     description="ingest jsonl, parquet or npy files into a qdrant index")
+    parser.add_argument("paths", nargs="+", help="input files (.jsonl, .ndjson, .parquet, .npy)")
+    parser.add_argument("--index", required=True, help="the name of the index to write into")
+    parser.add_argument("--url", default="http://localhost:6333", help="the qdrant url")
+    parser.add_argument("--create", action="store_true", help="create the index before ingesting")
+    parser.add_argument("--size", type=int, help="vector size, required with --create")
+    parser.add_argument("--distance", default="Cosine", help="vector distance (Cosine, Dot, Euclid, Manhattan)")
+    parser.add_argument("--id-field", default="id", help="the field holding the object id")
+    parser.add_argument("--vector-field", default="vector", help="the field holding the vector")
+    parser.add_argument("--id-offset", type=int, default=0, help="object id of the first row of the first npy file, "
+                                                                      "following npy files continue from it")
+    parser.add_argument("--batch-size", type=int, default=1000, help="rows per batch")
+    parser.add_argument("--workers", type=int, default=None, help="parse processes, defaults to cpu count")
+    parser.add_argument("--upsert-workers", type=int, default=2, help="upsert threads; with more than one, ids repeated across "
+                                                                      "batches may not keep their last write, "
+                                                                      "use 1 to upsert in input order")
+    parser.add_argument("--progress-every", type=int, default=10, help="report progress every n batches")
+    args = parser.parse_args(argv)
+    if args.create and not args.size:
+        parser.error("--size is required with --create")
+    return args
+
+
+def main(argv: list[str] = None) -> None:
+    """
+    command line entry point of the ingest
+    :param argv: the arguments, defaults to sys.argv
+    :return:
+    """
+    args = _parse_args(argv)
+    connector = QdrantConnector(connection_params=QdrantConnectionParams(conn_type=ConnType.LOCAL, url=args.url),
+                                index_configs=[])
+    if args.create:
+        connector.create_index(IndexConfig(index_name=args.index,
+                                           config_data={'size': args.size, 'distance': args.distance}))
+    stats = ingest(connector=connector, index_name=args.index, paths=args.paths, batch_size=args.batch_size,
+                   id_field=args.id_field, vector_field=args.vector_field, id_offset=args.id_offset,
+                   workers=args.workers, upsert_workers=args.upsert_workers,
+                   progress=_progress_printer(args.progress_every))
+    print(f"done, {stats}, connector: {connector.stats()}", file=sys.stderr)
+    connector._close_connection()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+from qdrant_connector.src.adaptive_controller import ErrorAction, classify_error
+from qdrant_connector.src.executor_utils import bounded_map
+from qdrant_connector.src.qdrant_connection_params import QdrantConnectionParams, ConnType
+from qdrant_connector.src.qdrant_connector import QdrantConnector
+
+
+def _batches(ids: Iterable[Any], batch_size: int) -> Iterator[list]:
+    """
+    internal split the ids into lists of batch_size
+    :return: generator of id lists
+    """
+    iterator = iter(ids)
+    while batch := list(islice(iterator, batch_size)):
+        yield batch
+
+
+class KnnJoinStats:
+    """
+    helper class to track the progress of a k nearest neighbor self-join
+    """
+
+    def __init__(self) -> None:
+        """
+        create an empty stats object
+        """
+        self.written = 0
+        self.missing = 0
+
+    def __str__(self) -> str:
+        """
+        helper method to print the internals
+        :return:
+        """
+        return f"written: {self.written}, missing: {self.missing}"
+
+
+def _is_not_found(exc: Exception) -> bool:
+    """
+    internal check if a failed query was caused by an example point missing from the index
+    :param exc: the exception raised by the query
+    :return: True if a point was not found
+    """
+    return classify_error(exc) == ErrorAction.FAIL and 'not found' in str(exc).lower()
+
+
+def _query(connector: QdrantConnector, index_name: str, ids: list, k: int) -> list:
+    """
+    internal query the neighbors of a batch of stored points; if a point of the batch is not found
+    the batch is bisected, like the controller splits batches, so only the halves with a missing
+    point are queried again
+    :param connector: the connector to query with
+    :param index_name: the name of the index to search in
+    :param ids: the object ids of the points
+    :param k: the number of neighbors per point
+    :return: the hits of each point, None for the points not found
+    """
+    try:
+        return connector._recommend_batch(index_name=index_name, positive_ids=[[object_id] for object_id in ids],
+                                          limit=k)
+    except Exception as exc:
+        if not _is_not_found(exc):
+            raise
+        if len(ids) == 1:
+            return [None]
+    middle = len(ids) // 2
+    return _query(connector, index_name, ids[:middle], k) + _query(connector, index_name, ids[middle:], k)
+
+
+def _neighbors(connector: QdrantConnector, index_name: str, ids: list, k: int) -> tuple[list, list]:
+    """
+    internal find the k nearest neighbors of a batch of stored points, leaving out the points not found
+    :param connector: the connector to query with
+    :param index_name: the name of the index to search in
+    :param ids: the object ids of the points
+    :param k: the number of neighbors per point
+    :return: list of (id, list of (neighbor id, score)) tuples and the list of the ids not found
+    """
+    neighbors, missing = [], []
+    for object_id, hits in zip(ids, _query(connector, index_name, ids, k)):
+        if hits is None:
+            missing.append(object_id)
+        else:
+            neighbors.append((object_id, [(hit.id, hit.score) for hit in hits]))
+    return neighbors, missing
+
+
+def knn_self_join(connector: QdrantConnector, index_name: str, output_path: str, k: int = 10,
+                  ids: Optional[Iterable[Any]] = None, batch_size: int = 64, workers: int = 4,
+                  missing_path: Optional[str] = None,
+                  progress: Optional[Callable[[KnnJoinStats], None]] = None) -> KnnJoinStats:
+    """
+    compute the k nearest neighbors of every entity of an index, or of the given subset, by recommending
+    with the stored points as examples, so no vectors are transferred; the requests are batched and
+    sent by parallel workers and the results are streamed to a jsonl file, one
+    {"id": ..., "neighbors": [[id, score], ...]} line per entity, in the order of the ids;
+    ids are written as stored in qdrant, integers for numeric ids and uuid strings otherwise
+    :param connector: the connector to query with
+    :param index_name: the name of the index to search in
+    :param output_path: the path of the jsonl file to write
+    :param k: the number of neighbors per entity, the entity itself is excluded
+    :param ids: the object ids of the entities, defaults to all entities of the index
+    :param batch_size: the number of entities per request
+    :param workers: the number of parallel requests
+    :param missing_path: optional file to write the ids not found in the index to, one per line;
+     missing ids are skipped either way
+    :param progress: optional callback called with the stats after each batch
+    :return: the stats of the run
+    """
+    if index_name not in {collection.name for collection in connector._check_collections()}:
+        raise ValueError(f"index not found: {index_name}")
+    if ids is None:
+        ids = connector._scroll_ids(index_name=index_name)
+    ids = (connector._get_object_id(object_id=str(object_id)) for object_id in ids)
+    tasks = ((_neighbors, (connector, index_name, batch, k)) for batch in _batches(ids, batch_size))
+    stats = KnnJoinStats()
+    with open(output_path, "w", encoding="utf-8") as f, \
+            open(missing_path or os.devnull, "w", encoding="utf-8") as missing_file, \
+            ThreadPoolExecutor(max_workers=workers) as pool:
+        for neighbors, missing in bounded_map(pool, tasks, max_in_flight=workers * 2):
+            for object_id, object_neighbors in neighbors:
+                f.write(json.dumps({'id': object_id, 'neighbors': object_neighbors}) + "\n")
+            for object_id in missing:
+                missing_file.write(f"{object_id}\n")
+            stats.written += len(neighbors)
+            stats.missing += len(missing)
+            if progress:
+                progress(stats)
+    return stats
+
+
+def _parse_args(argv: list[str] = None) -> argparse.Namespace:
+    """
+    internal parse the command line arguments
+    :param argv: the arguments, defaults to sys.argv
+    :return: the parsed arguments
+    """
+    parser = argparse.ArgumentParser(prog="python -m qdrant_connector.src.knn_join",
+                                     description="compute the k nearest neighbors of the entities of a qdrant index")
+    parser.add_argument("--index", required=True, help="the name of the index to search in")
+    parser.add_argument("--output", required=True, help="the jsonl file to write the neighbors to")
+    parser.add_argument("--url", default="http://localhost:6333", help="the qdrant url")
+    parser.add_argument("--k", type=int, default=10, help="neighbors per entity")
+    parser.add_argument("--ids", help="file with one object id per line, defaults to all entities")
+    parser.add_argument("--batch-size", type=int, default=64, help="entities per request")
+    parser.add_argument("--workers", type=int, default=4, help="parallel requests")
+    parser.add_argument("--missing", help="file to write the ids not found in the index to")
+    parser.add_argument("--progress-every", type=int, default=10000, help="report progress every n entities")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] = None) -> None:
+    """
+    command line entry point of the k nearest neighbor self-join
+    :param argv: the arguments, defaults to sys.argv
+    :return:
+    """
+    args = _parse_args(argv)
+    connector = QdrantConnector(connection_params=QdrantConnectionParams(conn_type=ConnType.LOCAL, url=args.url),
+                                index_configs=[])
+    ids = None
+    if args.ids:
+        with open(args.ids, encoding="utf-8") as f:
+            ids = [line.strip() for line in f if line.strip()]
+
+    reported = [0]
+
+    def report(stats: KnnJoinStats) -> None:
+        done = stats.written + stats.missing
+        if done - reported[0] >= args.progress_every:
+            reported[0] = done
+            print(stats, file=sys.stderr, flush=True)
+
+    stats = knn_self_join(connector=connector, index_name=args.index, output_path=args.output, k=args.k, ids=ids,
+                          batch_size=args.batch_size, workers=args.workers, missing_path=args.missing,
+                          progress=report)
+    print(f"done, {stats}, connector: {connector.stats()}", file=sys.stderr)
+    connector._close_connection()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,30 +1,43 @@
-from typing import Any
-
-from qdrant_client import QdrantClient
-from qdrant_client.models import PointStruct
-from qdrant_client.models import VectorParams
-from qdrant_client.models import Filter, FieldCondition, MatchValue
-
+import threading
+from typing import Any, Iterator, TYPE_CHECKING
 
+from qdrant_connector.src.adaptive_controller import AdaptiveController
 from qdrant_connector.src.data.entity import Entity, EntityData
 from qdrant_connector.src.data.field import Field, FieldData
 from qdrant_connector.src.data.index import IndexConfig
 from qdrant_connector.src.qdrant_connection_params import QdrantConnectionParams
 
+# the qdrant client modules are slow to import, they are only imported on first use
+if TYPE_CHECKING:
+    from qdrant_client import QdrantClient
+    from qdrant_client.models import Filter
+
 
 class QdrantConnector:
     """
     Qdrant vector db connector
     """
 
-    def __init__(self, connection_params: QdrantConnectionParams, index_configs: list[IndexConfig]) -> None:
+    def __init__(self, connection_params: QdrantConnectionParams, index_configs: list[IndexConfig],
+                 controller: AdaptiveController = None) -> None:
         """
         Creates a qdrant connector
         :param connection_params: connection params, e.g. url and type
         :param index_configs: list of index configs to use
-        """
-        self._client = None
-        self._connect(connection_params)
+        :param controller: controller of the batch size, concurrency and retries of upserts and searches,
+         a default one is created if not given; the in-memory client is not thread-safe, so an in-memory
+         connector only accepts a controller with max_concurrency=1
+        """
+        self._qdrant_client = None
+        self._connection_params = connection_params
+        self._connect_lock = threading.Lock()
+        if connection_params.url == ":memory:":
+            # the in-memory client is not thread-safe, its requests have to be sent one at a time
+            if controller is None:
+                controller = AdaptiveController(concurrency=1, max_concurrency=1)
+            elif controller.max_concurrency > 1:
+                raise ValueError("an in-memory connector requires a controller with max_concurrency=1")
+        self._controller = controller or AdaptiveController()
         self._index_configs: dict[str, IndexConfig] = {
             index_config.index_name: index_config
             for index_config in (index_configs or [])
@@ -37,15 +50,27 @@ class QdrantConnector:
         :param connection_params: connection params, e.g. url and type
         :return: qdrant client with the opened connection
         """
-        self._client = QdrantClient(connection_params.url)
+        from qdrant_client import QdrantClient
+        self._qdrant_client = QdrantClient(connection_params.url)
+
+    @property
+    def _client(self) -> "QdrantClient":
+        """
+        internal qdrant client, the connection is created on first use
+        :return: qdrant client with the opened connection
+        """
+        if self._qdrant_client is None:
+            with self._connect_lock:
+                if self._qdrant_client is None:
+                    self._connect(self._connection_params)
+        return self._qdrant_client
 
     def _close_connection(self) -> None:
         """
-        internal TODO
+        internal stop the upsert threads of the controller
         :return:
         """
-        # nothing to close in local in-memory qdrant
-        pass
+        self._controller.close()
 
     def _create_search_index(self, index_config: IndexConfig) -> None:
         """
@@ -53,6 +78,7 @@ class QdrantConnector:
         :param index_config: index config for name and vector params
         :return:
         """
+        from qdrant_client.models import VectorParams
         self._index_configs[index_config.index_name] = index_config
         self._client.create_collection(collection_name=index_config.index_name,
                                        vectors_config=
@@ -92,21 +118,63 @@ class QdrantConnector:
             pass
         return object_id
 
-    def _upsert(self, payload: list[dict]) -> None:
+    def _upsert(self, payload: list[dict], index_name: str = None) -> None:
         """
         internal upsert data into collection
         :param payload: all the data to be inserted including text payload and vectors
+        :param index_name: the collection to upsert into, defaults to the last created index
         :return:
         """
-        points = []
+        from qdrant_client.models import PointStruct
+        # the batches are sent in parallel, so only the last item of an id is kept to preserve last-write-wins
+        points = {}
         for item in payload:
             object_id = self._get_object_id(object_id=item['object_id'])
-            point = PointStruct(id=object_id, vector=item['vector'], payload=item)
-            points.append(point)
-        self._client.upsert(collection_name=self._collection_name,
-                            wait=True,
-                            points=points
-                            )
+            points.pop(object_id, None)
+            points[object_id] = PointStruct(id=object_id, vector=item['vector'], payload=item)
+        points = list(points.values())
+        collection_name = index_name or self._collection_name
+        self._controller.run_batches(lambda batch: self._client.upsert(collection_name=collection_name,
+                                                                       wait=True,
+                                                                       points=batch
+                                                                       ),
+                                     points)
+
+    def _upsert_batch(self, ids: list, vectors: Any, payloads: list[dict], index_name: str = None) -> None:
+        """
+        internal upsert a column-wise batch, e.g. parsed by the ingest, without building a point object per row;
+        only the given payloads are stored, the object id and vector are not copied into them
+        :param ids: the raw object ids of the rows
+        :param vectors: 2d array or list of the vectors of the rows
+        :param payloads: the payload of each row
+        :param index_name: the collection to upsert into, defaults to the last created index
+        :return:
+        """
+        from qdrant_client.models import Batch
+        ids = [self._get_object_id(object_id=str(object_id)) for object_id in ids]
+        last_rows = {object_id: row for row, object_id in enumerate(ids)}
+        if len(last_rows) < len(ids):
+            # the batches are sent in parallel, so only the last row of an id is kept to preserve last-write-wins
+            rows = sorted(last_rows.values())
+            ids = [ids[row] for row in rows]
+            vectors = vectors[rows] if hasattr(vectors, 'shape') else [vectors[row] for row in rows]
+            payloads = [payloads[row] for row in rows]
+        collection_name = index_name or self._collection_name
+
+        def send(rows: range) -> None:
+            batch_vectors = vectors[rows.start:rows.stop]
+            # the columns are already typed by the caller, skipping the per-float pydantic validation
+            # keeps the cost of a batch in the calling process low
+            self._client.upsert(collection_name=collection_name,
+                                wait=True,
+                                points=Batch.model_construct(ids=ids[rows.start:rows.stop],
+                                                             vectors=batch_vectors.tolist()
+                                                             if hasattr(batch_vectors, 'tolist')
+                                                             else list(batch_vectors),
+                                                             payloads=payloads[rows.start:rows.stop])
+                                )
+
+        self._controller.run_batches(send, range(len(ids)))
 
     def _scroll(self, index_name: str) -> Any:
         """
@@ -121,6 +189,43 @@ class QdrantConnector:
             with_vectors=False,
         )
 
+    def _scroll_ids(self, index_name: str, page_size: int = 1000) -> Iterator[Any]:
+        """
+        internal helper to iterate over all point ids of a given collection page by page
+        :param index_name: the collection to scroll
+        :param page_size: the number of ids fetched per request
+        :return: generator of the point ids, without payload and vectors
+        """
+        offset = None
+        while True:
+            records, offset = self._controller.call(
+                self._client.scroll,
+                collection_name=index_name,
+                limit=page_size,
+                offset=offset,
+                with_payload=False,
+                with_vectors=False,
+            )
+            for record in records:
+                yield record.id
+            if offset is None:
+                return
+
+    def warmup(self) -> dict[str, bool]:
+        """
+        connect to qdrant ahead of the first operation and check the configured indexes
+        :return: dict of the configured index names and whether they exist in qdrant
+        """
+        existing = {collection.name for collection in self._check_collections()}
+        return {index_name: index_name in existing for index_name in self._index_configs}
+
+    def stats(self) -> dict[str, Any]:
+        """
+        stats of the adaptive controller of upserts and searches
+        :return: dict of the current batch size, concurrency, latencies and request, retry, split and error counts
+        """
+        return self._controller.stats()
+
     def create_index(self, index_config: IndexConfig) -> None:
         """
         create_index to create an index
@@ -195,7 +300,7 @@ class QdrantConnector:
             payload.append(payload_item)
         self._upsert(payload)
 
-    def _search(self, index_name: str, vector: list[float], limit: int, search_filter: Filter = None) -> Any:
+    def _search(self, index_name: str, vector: list[float], limit: int, search_filter: "Filter" = None) -> Any:
         """
         internal search with given criteria
         :param index_name: the name of the index to search in
@@ -204,7 +309,8 @@ class QdrantConnector:
         :param search_filter: search filter to be used if any specified
         :return: the records returned by the search in qdrant
         """
-        return self._client.search(
+        return self._controller.call(
+            self._client.search,
             collection_name=index_name,
             query_vector=vector,
             query_filter=search_filter,
@@ -212,6 +318,54 @@ class QdrantConnector:
             limit=limit  # Return 5 closest points
         )
 
+    def _recommend_query(self, positive_ids: list[str], negative_ids: list[str] = None) -> Any:
+        """
+        internal build a recommend query using stored points as examples, so no vectors are sent
+        :param positive_ids: the object ids of the points the results should be similar to
+        :param negative_ids: the object ids of the points the results should be dissimilar to
+        :return: the recommend query
+        """
+        from qdrant_client.models import RecommendInput, RecommendQuery
+        return RecommendQuery(recommend=RecommendInput(
+            positive=[self._get_object_id(object_id=str(object_id)) for object_id in positive_ids],
+            negative=[self._get_object_id(object_id=str(object_id)) for object_id in (negative_ids or [])],
+        ))
+
+    def _recommend(self, index_name: str, positive_ids: list[str], negative_ids: list[str], limit: int) -> Any:
+        """
+        internal recommend points by the ids of stored examples, the examples are excluded from the results
+        :param index_name: the name of the index to search in
+        :param positive_ids: the object ids of the positive examples
+        :param negative_ids: the object ids of the negative examples
+        :param limit: the limit of results
+        :return: the records returned by qdrant
+        """
+        return self._controller.call(
+            self._client.query_points,
+            collection_name=index_name,
+            query=self._recommend_query(positive_ids=positive_ids, negative_ids=negative_ids),
+            with_payload=True,
+            limit=limit
+        ).points
+
+    def _recommend_batch(self, index_name: str, positive_ids: list[list[str]], limit: int,
+                         with_payload: bool = False) -> list[list]:
+        """
+        internal recommend for several groups of positive examples in one request
+        :param index_name: the name of the index to search in
+        :param positive_ids: list of the positive example object ids of each query
+        :param limit: the limit of results per query
+        :param with_payload: whether the payload should be returned
+        :return: list of the records returned for each query
+        """
+        from qdrant_client.models import QueryRequest
+        requests = [QueryRequest(query=self._recommend_query(positive_ids=ids), limit=limit,
+                                 with_payload=with_payload)
+                    for ids in positive_ids]
+        responses = self._controller.call(self._client.query_batch_points, collection_name=index_name,
+                                          requests=requests)
+        return [response.points for response in responses]
+
     def _prepare_search_results(self, hits: list, returned_fields: list[Field]) -> list[EntityData]:
         """
         internal prepare the search results as Entity data
@@ -219,7 +373,6 @@ class QdrantConnector:
         :return: the list of EntityData constructed from the search results
         """
         results = []
-        data = None
         hit_id = None
         for hit in hits:
             field_data_list = []
@@ -231,7 +384,7 @@ class QdrantConnector:
                         field_data = FieldData(name=field.name, value=payload[key])
                         field_data_list.append(field_data)
             data = EntityData(entity_id=hit_id, field_data=field_data_list)
-        results.append(data)
+            results.append(data)
         return results
 
     def search_with_filter(self, index_name: str, vector: list[float], returned_fields: list[Field], limit: int,
@@ -247,12 +400,29 @@ class QdrantConnector:
         :return: list of entity data with the given fields filtered by the payload content,
          constructed from the search results
         """
+        from qdrant_client.models import Filter, FieldCondition, MatchValue
         query_filter = Filter(
             must=[FieldCondition(key=condition_key, match=MatchValue(value=condition_value))]
         )
         hits = self._search(index_name=index_name, vector=vector, limit=limit, search_filter=query_filter)
         return self._prepare_search_results(hits=hits, returned_fields=returned_fields)
 
+    def recommend(self, index_name: str, positive_ids: list[str], returned_fields: list[Field], limit: int,
+                  negative_ids: list[str] = None) -> list[EntityData]:
+        """
+        search for entities similar to stored entities given by their object ids, the vectors are
+        looked up in qdrant and the given entities are not part of the results
+        :param index_name: name of the index to search in
+        :param positive_ids: object ids of the entities the results should be similar to
+        :param returned_fields: the list of fields that should be present in the returned data
+        :param limit: the limit of the search results
+        :param negative_ids: object ids of the entities the results should be dissimilar to
+        :return: list of entity data with the given fields, constructed from the search results
+        """
+        hits = self._recommend(index_name=index_name, positive_ids=positive_ids, negative_ids=negative_ids,
+                               limit=limit)
+        return self._prepare_search_results(hits=hits, returned_fields=returned_fields)
+
     def search(self, index_name: str, vector: list[float], returned_fields: list[Field], limit: int) \
             -> list[EntityData]:
         """
@@ -0,0 +1,190 @@
+import threading
+import time
+import unittest
+
+from qdrant_connector.src.adaptive_controller import AdaptiveController, ErrorAction, classify_error
+
+
+class FakeResponseError(Exception):
+    """
+    helper exception with an http status code like the qdrant client errors
+    """
+
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+class ConnectError(Exception):
+    """
+    helper exception named like the httpx transport error, which is not a ConnectionError
+    """
+
+
+class ResponseHandlingException(Exception):
+    """
+    helper exception wrapping a transport error in source like the qdrant client does
+    """
+
+    def __init__(self, source):
+        super().__init__(str(source))
+        self.source = source
+
+
+class AdaptiveControllerTest(unittest.TestCase):
+    """
+    unit tests for the adaptive controller
+    """
+
+    def create_controller(self, **kwargs):
+        """
+        create a controller which does not wait between retries
+        :return: the controller
+        """
+        return AdaptiveController(sleep=lambda seconds: None, **kwargs)
+
+    def test_classify_error(self):
+        """
+        test the error classification
+        :return:
+        """
+        self.assertEqual(classify_error(FakeResponseError(413)), ErrorAction.SPLIT, "too large not split")
+        self.assertEqual(classify_error(TimeoutError()), ErrorAction.SPLIT, "timeout not split")
+        self.assertEqual(classify_error(FakeResponseError(503)), ErrorAction.RETRY, "overload not retried")
+        self.assertEqual(classify_error(ConnectionResetError()), ErrorAction.RETRY, "connection error not retried")
+        self.assertEqual(classify_error(ValueError()), ErrorAction.FAIL, "value error retried")
+        try:
+            try:
+                raise TimeoutError()
+            except TimeoutError as exc:
+                raise RuntimeError("wrapped") from exc
+        except RuntimeError as wrapped:
+            self.assertEqual(classify_error(wrapped), ErrorAction.SPLIT, "wrapped timeout not split")
+        self.assertEqual(classify_error(ResponseHandlingException(ConnectError("refused"))), ErrorAction.RETRY,
+                         "wrapped connect error not retried")
+
+    def test_run_batches(self):
+        """
+        test all items are sent in batches of the batch size
+        :return:
+        """
+        controller = self.create_controller(batch_size=10, batch_size_step=0)
+        sent = []
+        lock = threading.Lock()
+
+        def send(batch):
+            with lock:
+                sent.append(batch)
+
+        controller.run_batches(send, list(range(35)))
+        controller.close()
+        self.assertEqual(sorted(item for batch in sent for item in batch), list(range(35)), "items lost")
+        self.assertEqual(sorted(len(batch) for batch in sent), [5, 10, 10, 10], "wrong batch sizes")
+
+    def test_split_on_timeout(self):
+        """
+        test batches above the server limit are split until they succeed and the batch size is decreased
+        :return:
+        """
+        controller = self.create_controller(batch_size=16, batch_size_step=0, concurrency=1)
+        sent = []
+
+        def send(batch):
+            if len(batch) > 4:
+                raise TimeoutError()
+            sent.extend(batch)
+
+        controller.run_batches(send, list(range(16)))
+        stats = controller.stats()
+        controller.close()
+        self.assertEqual(sorted(sent), list(range(16)), "items lost")
+        self.assertEqual(stats['splits'], 3, "wrong number of splits")
+        self.assertLess(stats['batch_size'], 16, "batch size not decreased")
+
+    def test_split_below_server_limit(self):
+        """
+        test a batch far above the server limit is split as often as needed, splits do not use up retries
+        :return:
+        """
+        controller = self.create_controller(batch_size=4096, max_batch_size=4096, concurrency=1, max_retries=5)
+        sent = []
+
+        def send(batch):
+            if len(batch) > 100:
+                raise TimeoutError()
+            sent.extend(batch)
+
+        controller.run_batches(send, list(range(4096)))
+        stats = controller.stats()
+        controller.close()
+        self.assertEqual(sorted(sent), list(range(4096)), "items lost")
+        self.assertEqual(stats['retries'], 0, "splits counted as retries")
+
+    def test_retry(self):
+        """
+        test retryable errors are retried and fatal errors raised
+        :return:
+        """
+        controller = self.create_controller(max_retries=2)
+        calls = []
+
+        def flaky():
+            calls.append(1)
+            if len(calls) < 3:
+                raise FakeResponseError(503)
+            return "ok"
+
+        self.assertEqual(controller.call(flaky), "ok", "wrong result")
+        self.assertEqual(controller.stats()['retries'], 2, "wrong number of retries")
+
+        def overloaded():
+            raise FakeResponseError(429)
+
+        with self.assertRaises(FakeResponseError):
+            controller.call(overloaded)
+        self.assertEqual(controller.stats()['retries'], 4, "retries not limited")
+        with self.assertRaises(ValueError):
+            controller.call(int, "x")
+        self.assertEqual(controller.stats()['in_flight'], 0, "slots not released")
+
+    def test_aimd(self):
+        """
+        test the batch size is increased additively and decreased multiplicatively
+        :return:
+        """
+        controller = self.create_controller(batch_size=100, batch_size_step=10, max_batch_size=120,
+                                            concurrency=2, target_latency=1.0)
+        controller._on_success(0.1, tune_batch_size=True)
+        self.assertEqual(controller.batch_size, 110, "batch size not increased")
+        controller._on_success(0.1, tune_batch_size=True)
+        controller._on_success(0.1, tune_batch_size=True)
+        self.assertEqual((controller.batch_size, controller.concurrency), (120, 3), "concurrency not increased")
+        controller._on_success(2.0, tune_batch_size=True)
+        self.assertEqual(controller.batch_size, 60, "batch size not decreased on slow request")
+        controller._on_error(ErrorAction.RETRY, tune_batch_size=True, started=time.monotonic())
+        self.assertEqual((controller.batch_size, controller.concurrency), (60, 1), "concurrency not decreased")
+        controller = self.create_controller(concurrency=4, target_latency=1.0)
+        controller._on_success(2.0, tune_batch_size=False)
+        self.assertEqual(controller.concurrency, 2, "concurrency not decreased on slow call")
+        controller = self.create_controller(batch_size=1, concurrency=4, target_latency=1.0)
+        controller._on_success(2.0, tune_batch_size=True)
+        self.assertEqual(controller.concurrency, 2, "concurrency not decreased at minimal batch size")
+
+    def test_decrease_once_per_window(self):
+        """
+        test the requests in flight during a decrease do not decrease the limits again
+        :return:
+        """
+        controller = self.create_controller(batch_size=256, concurrency=8, target_latency=1.0)
+        started = time.monotonic()
+        for _ in range(8):
+            controller._on_error(ErrorAction.SPLIT, tune_batch_size=True, started=started)
+        self.assertEqual((controller.batch_size, controller.concurrency), (128, 4), "decreased more than once")
+        controller._on_success(2.0, tune_batch_size=True, started=started)
+        self.assertEqual(controller.batch_size, 128, "slow request of the same window decreased again")
+        controller._on_error(ErrorAction.RETRY, tune_batch_size=True, started=time.monotonic())
+        self.assertEqual(controller.concurrency, 2, "request of the next window did not decrease")
+
+
+if __name__ == '__main__':
+    unittest.main()
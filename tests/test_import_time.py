@@ -0,0 +1,75 @@
+import os
+import subprocess
+import sys
+import unittest
+
+# the directory containing the qdrant_connector package
+PACKAGE_PARENT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+COLD_START = """
+import sys, time
+start = time.perf_counter()
+from qdrant_connector.src.qdrant_connector import QdrantConnector
+from qdrant_connector.src.qdrant_connection_params import QdrantConnectionParams, ConnType
+connector = QdrantConnector(connection_params=QdrantConnectionParams(conn_type=ConnType.MEMORY), index_configs=[])
+constructed = time.perf_counter()
+heavy = 'qdrant_client' in sys.modules
+connector._check_collections()
+first_call = time.perf_counter()
+client = connector._qdrant_client
+connector._check_collections()
+reused = connector._qdrant_client is client
+print(heavy, constructed - start, first_call - constructed, reused)
+"""
+
+CLIENT_IMPORT = """
+import time
+start = time.perf_counter()
+import qdrant_client
+print(time.perf_counter() - start)
+"""
+
+# generous upper limit of importing and constructing the connector in seconds
+COLD_START_BUDGET = 0.5
+# generous upper limit of the first operation in seconds, including the deferred import and connect
+FIRST_CALL_BUDGET = 5.0
+
+
+class ImportTimeTest(unittest.TestCase):
+    """
+    benchmark guarding the cold start of the connector
+    """
+
+    def run_fresh(self, code):
+        """
+        run code in a fresh interpreter
+        :param code: the code to run
+        :return: the whitespace separated output
+        """
+        env = dict(os.environ, PYTHONPATH=PACKAGE_PARENT)
+        return subprocess.run([sys.executable, "-c", code], env=env, check=True,
+                              capture_output=True, text=True).stdout.split()
+
+    def test_cold_start(self):
+        """
+        test importing and constructing the connector does not load the qdrant client and is
+        faster than importing the qdrant client, and the first operation connects once within
+        its budget, measured in fresh interpreters
+        :return:
+        """
+        heavy, cold_start, first_call, reused = self.run_fresh(COLD_START)
+        cold_start, first_call = float(cold_start), float(first_call)
+        client_import = float(self.run_fresh(CLIENT_IMPORT)[0])
+        self.assertEqual(heavy, "False", "qdrant client imported before first use")
+        self.assertLess(first_call, FIRST_CALL_BUDGET,
+                        f"first call {first_call * 1000:.1f}ms over budget {FIRST_CALL_BUDGET * 1000:.0f}ms")
+        self.assertEqual(reused, "True", "connection created again on the second call")
+        self.assertLess(cold_start, COLD_START_BUDGET,
+                        f"cold start {cold_start * 1000:.1f}ms over budget {COLD_START_BUDGET * 1000:.0f}ms")
+        self.assertLess(cold_start, client_import,
+                        f"cold start {cold_start * 1000:.1f}ms not faster than importing qdrant_client "
+                        f"{client_import * 1000:.1f}ms")
+
+
+if __name__ == '__main__':
+    unittest.main()
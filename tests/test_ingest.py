@@ -0,0 +1,156 @@
+import importlib.util
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from qdrant_client.models import Distance
+
+from qdrant_connector.src.data.index import IndexConfig
+from qdrant_connector.src.ingest import ingest, parse_jsonl_lines, parse_npy_slice
+from qdrant_connector.src.qdrant_connector import QdrantConnector
+from qdrant_connector.src.qdrant_connection_params import QdrantConnectionParams, ConnType
+from qdrant_connector.tests.helper.helper import TestHelper
+
+
+class IngestTest(unittest.TestCase):
+    """
+    unit tests for the file ingest
+    """
+
+    def setUp(self):
+        """
+        create a connector with an index and a temporary directory for the input files
+        :return:
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        conn_type = QdrantConnectionParams(conn_type=ConnType.MEMORY)
+        self.connector = QdrantConnector(connection_params=conn_type, index_configs=[])
+        self.connector.create_index(IndexConfig(index_name="test1", config_data={'size': 10,
+                                                                                 'distance': Distance.DOT}))
+
+    def tearDown(self):
+        """
+        remove the index and the input files
+        :return:
+        """
+        self.connector.drop_index(index_name="test1")
+        self.tmp_dir.cleanup()
+
+    def write_jsonl(self, rows):
+        """
+        write rows to a jsonl file in the temporary directory
+        :param rows: the rows to write
+        :return: the path of the file
+        """
+        path = os.path.join(self.tmp_dir.name, "input.jsonl")
+        with open(path, "w") as f:
+            for row in rows:
+                f.write(json.dumps(row) + "\n")
+        return path
+
+    def test_parse_jsonl_lines(self):
+        """
+        test the jsonl rows are converted into a compact point batch
+        :return:
+        """
+        vector = TestHelper.vector_generator()
+        batch = parse_jsonl_lines([json.dumps({'id': 7, 'vector': vector, 'f1': 'abc'}), "\n"])
+        self.assertEqual(len(batch), 1, "blank line not skipped")
+        self.assertEqual(batch.ids, [7], "wrong object ids")
+        self.assertEqual(batch.vectors.dtype, np.float32, "vectors not float32")
+        self.assertEqual(batch.vectors.shape, (1, 10), "wrong vectors shape")
+        self.assertEqual(batch.payloads, [{'f1': 'abc'}], "wrong payload")
+
+    def test_parse_jsonl_missing_field(self):
+        """
+        test a missing id field is reported with the file and line
+        :return:
+        """
+        lines = [json.dumps({'id': 1, 'vector': [0.1]}), json.dumps({'vector': [0.1]})]
+        with self.assertRaisesRegex(ValueError, "input.jsonl, row 6: missing field 'id'"):
+            parse_jsonl_lines(lines, source="input.jsonl", first_line=5)
+
+    def test_parse_npy_slice(self):
+        """
+        test the npy rows get their position as object id
+        :return:
+        """
+        path = os.path.join(self.tmp_dir.name, "input.npy")
+        np.save(path, np.random.rand(5, 10))
+        batch = parse_npy_slice(path, start=2, stop=4, id_offset=100)
+        self.assertEqual(batch.ids, [102, 103], "wrong object ids")
+        self.assertEqual((batch.vectors.dtype, batch.vectors.shape), (np.float32, (2, 10)), "wrong vectors")
+
+    def test_ingest_jsonl(self):
+        """
+        test ingesting a jsonl file through the worker pools
+        :return:
+        """
+        rows = [{'id': i, 'vector': TestHelper.vector_generator(), 'name': TestHelper.str_generator()}
+                for i in range(1, 26)]
+        path = self.write_jsonl(rows)
+        stats = ingest(connector=self.connector, index_name="test1", paths=[path], batch_size=10, workers=2)
+        self.assertEqual(stats.rows, 25, "not all rows ingested")
+        self.assertEqual(stats.batches, 3, "wrong number of batches")
+        self.assertEqual(self.connector._client.count(collection_name="test1").count, 25, "rows not stored")
+        point = self.connector._client.retrieve(collection_name="test1", ids=[1])[0]
+        self.assertEqual(point.payload, {'name': rows[0]['name']}, "id or vector copied into the payload")
+
+    def test_ingest_in_order(self):
+        """
+        test with one upsert worker an id repeated across batches keeps its last write
+        :return:
+        """
+        rows = [{'id': i % 10 + 1, 'vector': TestHelper.vector_generator(), 'name': str(i)} for i in range(30)]
+        path = self.write_jsonl(rows)
+        ingest(connector=self.connector, index_name="test1", paths=[path], batch_size=10, workers=2,
+               upsert_workers=1)
+        point = self.connector._client.retrieve(collection_name="test1", ids=[1])[0]
+        self.assertEqual(point.payload, {'name': '20'}, "last write not kept")
+
+    def test_ingest_npy_files(self):
+        """
+        test the rows of several npy files get consecutive ids and do not overwrite each other
+        :return:
+        """
+        paths = [os.path.join(self.tmp_dir.name, f"input{i}.npy") for i in range(2)]
+        for path in paths:
+            np.save(path, np.random.rand(50, 10).astype(np.float32))
+        stats = ingest(connector=self.connector, index_name="test1", paths=paths, batch_size=20, id_offset=1,
+                       workers=2)
+        self.assertEqual(stats.rows, 100, "not all rows ingested")
+        self.assertEqual(self.connector._client.count(collection_name="test1").count, 100, "rows overwritten")
+        self.assertEqual(len(self.connector._client.retrieve(collection_name="test1", ids=[1, 100])), 2,
+                         "wrong object ids")
+
+    @unittest.skipUnless(importlib.util.find_spec("pyarrow"), "pyarrow is not installed")
+    def test_ingest_parquet(self):
+        """
+        test ingesting a parquet file with several row groups
+        :return:
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        path = os.path.join(self.tmp_dir.name, "input.parquet")
+        table = pa.table({'id': list(range(1, 31)),
+                          'vector': [TestHelper.vector_generator() for _ in range(30)],
+                          'name': [TestHelper.str_generator() for _ in range(30)]})
+        pq.write_table(table, path, row_group_size=10)
+        stats = ingest(connector=self.connector, index_name="test1", paths=[path], workers=2)
+        self.assertEqual((stats.rows, stats.batches), (30, 3), "not all row groups ingested")
+        self.assertEqual(self.connector._client.count(collection_name="test1").count, 30, "rows not stored")
+
+    def test_ingest_unsupported_file(self):
+        """
+        test unsupported input types are rejected
+        :return:
+        """
+        for path in ("input.csv", "input.json"):
+            with self.assertRaises(ValueError):
+                ingest(connector=self.connector, index_name="test1", paths=[path], workers=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
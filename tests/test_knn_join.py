@@ -0,0 +1,122 @@
+import json
+import os
+import tempfile
+import unittest
+
+from qdrant_client.models import Distance
+
+from qdrant_connector.src.data.entity import EntityData, EntityId
+from qdrant_connector.src.data.field import FieldData
+from qdrant_connector.src.data.index import IndexConfig
+from qdrant_connector.src.knn_join import knn_self_join
+from qdrant_connector.src.qdrant_connector import QdrantConnector
+from qdrant_connector.src.qdrant_connection_params import QdrantConnectionParams, ConnType
+from qdrant_connector.tests.helper.helper import TestHelper
+
+
+class KnnSelfJoinTest(unittest.TestCase):
+    """
+    unit tests for the k nearest neighbor self-join
+    """
+
+    def setUp(self):
+        """
+        create a connector with an index of random vectors and a temporary output file
+        :return:
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.output_path = os.path.join(self.tmp_dir.name, "neighbors.jsonl")
+        conn_type = QdrantConnectionParams(conn_type=ConnType.MEMORY)
+        self.connector = QdrantConnector(connection_params=conn_type, index_configs=[])
+        self.connector.create_index(IndexConfig(index_name="test1", config_data={'size': 10,
+                                                                                 'distance': Distance.COSINE}))
+        self.connector.write_entities(entity_data=[
+            EntityData(entity_id=EntityId(object_id=str(i), schema_id='0'),
+                       field_data=[FieldData(name="vector", data_type="vector",
+                                             value=TestHelper.vector_generator())])
+            for i in range(1, 21)])
+
+    def tearDown(self):
+        """
+        remove the index and the output file
+        :return:
+        """
+        self.connector.drop_index(index_name="test1")
+        self.tmp_dir.cleanup()
+
+    def read_output(self):
+        """
+        read the neighbors written by the job
+        :return: list of the output rows
+        """
+        with open(self.output_path) as f:
+            return [json.loads(line) for line in f]
+
+    def test_all_entities(self):
+        """
+        test neighbors are computed for every entity of the index, excluding the entity itself
+        :return:
+        """
+        stats = knn_self_join(connector=self.connector, index_name="test1", output_path=self.output_path, k=3,
+                              batch_size=6, workers=2)
+        rows = self.read_output()
+        self.assertEqual(stats.written, 20, "wrong number of entities")
+        self.assertEqual(sorted(row['id'] for row in rows), list(range(1, 21)), "entities missing")
+        for row in rows:
+            neighbor_ids = [neighbor_id for neighbor_id, score in row['neighbors']]
+            self.assertEqual(len(neighbor_ids), 3, "wrong number of neighbors")
+            self.assertNotIn(row['id'], neighbor_ids, "entity is its own neighbor")
+
+    def test_subset(self):
+        """
+        test neighbors are computed only for the given ids, in their order, with the ids written as stored
+        :return:
+        """
+        stats = knn_self_join(connector=self.connector, index_name="test1", output_path=self.output_path, k=2,
+                              ids=['5', '3', '9'], batch_size=2)
+        self.assertEqual(stats.written, 3, "wrong number of entities")
+        self.assertEqual([row['id'] for row in self.read_output()], [5, 3, 9], "wrong entity ids")
+
+    def test_missing_ids(self):
+        """
+        test ids missing from the index are skipped and recorded without stopping the job
+        :return:
+        """
+        missing_path = os.path.join(self.tmp_dir.name, "missing.txt")
+        stats = knn_self_join(connector=self.connector, index_name="test1", output_path=self.output_path, k=2,
+                              ids=['5', '999', '9', '3', '998'], batch_size=2, missing_path=missing_path)
+        self.assertEqual((stats.written, stats.missing), (3, 2), "wrong number of entities")
+        self.assertEqual([row['id'] for row in self.read_output()], [5, 9, 3], "wrong entity ids")
+        with open(missing_path) as f:
+            self.assertEqual(f.read().split(), ['999', '998'], "missing ids not recorded")
+
+    def test_missing_id_requests(self):
+        """
+        test a batch with a missing id is bisected instead of queried id by id
+        :return:
+        """
+        recommend_batch = self.connector._recommend_batch
+        requests = []
+
+        def counting_recommend_batch(**kwargs):
+            requests.append(len(kwargs['positive_ids']))
+            return recommend_batch(**kwargs)
+
+        self.connector._recommend_batch = counting_recommend_batch
+        ids = [str(i) for i in range(1, 16)] + ['999']
+        stats = knn_self_join(connector=self.connector, index_name="test1", output_path=self.output_path, k=2,
+                              ids=ids, batch_size=16)
+        self.assertEqual((stats.written, stats.missing), (15, 1), "wrong number of entities")
+        self.assertEqual(len(requests), 9, "batch not bisected")
+
+    def test_missing_index(self):
+        """
+        test a missing index fails the job instead of reporting every id as missing
+        :return:
+        """
+        with self.assertRaises(ValueError):
+            knn_self_join(connector=self.connector, index_name="test2", output_path=self.output_path, ids=['1'])
+
+
+if __name__ == '__main__':
+    unittest.main()
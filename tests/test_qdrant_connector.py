@@ -1,6 +1,7 @@
 import unittest
 import uuid
 
+from qdrant_connector.src.adaptive_controller import AdaptiveController
 from qdrant_connector.src.data.entity import EntityData, EntityId, Entity
 from qdrant_connector.src.data.field import FieldData, Field
 from qdrant_connector.src.data.index import IndexConfig
@@ -112,6 +113,41 @@ class QdrantConnectorTest(unittest.TestCase):
         self.assertEqual(found, True,"id not found")
         connector.drop_index(index_name="test1")
 
+    def test_write_many_entities(self):
+        """
+        test writing more entities than fit in the parallel batches, with repeated ids keeping the last value
+        :return:
+        """
+        conn_type = QdrantConnectionParams(conn_type=ConnType.MEMORY)
+        idx1 = IndexConfig(index_name="test1", config_data={'size': 10, 'distance': Distance.DOT})
+        connector = QdrantConnector(connection_params=conn_type, index_configs=[idx1])
+        connector.create_index(index_config=idx1)
+        stats = connector.stats()
+        count = stats['batch_size'] * 8 + 100
+        connector.write_entities(entity_data=[
+            EntityData(entity_id=EntityId(object_id=str(i % count + 1), schema_id='0'),
+                       field_data=[FieldData(name="vector", data_type="vector", value=TestHelper.vector_generator()),
+                                   FieldData(name="f1", value=i)])
+            for i in range(count + 10)])
+        self.assertEqual(connector._client.count(collection_name="test1").count, count, "entities lost")
+        point = connector._client.retrieve(collection_name="test1", ids=[1])[0]
+        self.assertEqual(point.payload['f1'], count, "last write not kept")
+        connector.drop_index(index_name="test1")
+        connector._close_connection()
+
+    def test_memory_controller(self):
+        """
+        test an in-memory connector rejects a controller sending requests in parallel and leaves a given one as is
+        :return:
+        """
+        conn_type = QdrantConnectionParams(conn_type=ConnType.MEMORY)
+        with self.assertRaises(ValueError):
+            QdrantConnector(connection_params=conn_type, index_configs=[],
+                            controller=AdaptiveController(max_concurrency=8))
+        controller = AdaptiveController(concurrency=1, max_concurrency=1)
+        QdrantConnector(connection_params=conn_type, index_configs=[], controller=controller)
+        self.assertEqual(controller.max_concurrency, 1, "given controller changed")
+
     def test_read_entities(self):
         """
         test read entities
@@ -173,6 +209,30 @@ class QdrantConnectorTest(unittest.TestCase):
         self.assertEqual(len(connector._check_collections()), 0, "collection not deleted")
         connector._close_connection()
 
+    def test_recommend(self):
+        """
+        test recommend by stored entity ids
+        :return:
+        """
+        conn_type = QdrantConnectionParams(conn_type=ConnType.MEMORY)
+        idx1 = IndexConfig(index_name="test1", config_data={'size': 2, 'distance': Distance.COSINE})
+        connector = QdrantConnector(connection_params=conn_type, index_configs=[idx1])
+        connector.create_index(index_config=idx1)
+        vectors = {'1': [1.0, 0.0], '2': [0.9, 0.1], '3': [0.0, 1.0]}
+        connector.write_entities(entity_data=[
+            EntityData(entity_id=EntityId(object_id=object_id, schema_id='0'),
+                       field_data=[FieldData(name="vector", data_type="vector", value=vector),
+                                   FieldData(name="f1", value="v" + object_id)])
+            for object_id, vector in vectors.items()])
+        results = connector.recommend(index_name="test1", positive_ids=['1'], returned_fields=[Field(name="f1")],
+                                      limit=2)
+        self.assertEqual([result.entity_id for result in results], [2, 3], "wrong recommendations")
+        self.assertEqual(results[0].field_data[0].value, "v2", "wrong returned field")
+        results = connector.recommend(index_name="test1", positive_ids=['1'], negative_ids=['3'],
+                                      returned_fields=[Field(name="f1")], limit=1)
+        self.assertEqual(results[0].entity_id, 2, "wrong recommendation with negative example")
+        connector.drop_index(index_name="test1")
+
     def test_connection(self):
         """
         test qdrant connection
@@ -187,6 +247,30 @@ class QdrantConnectorTest(unittest.TestCase):
         self.assertEqual(len(connector._check_collections()), 0, "collections exists on start")
         connector._close_connection()
 
+    def test_lazy_connection(self):
+        """
+        test the connection is only created on first use
+        :return:
+        """
+        conn_type = QdrantConnectionParams(conn_type=ConnType.MEMORY)
+        connector = QdrantConnector(connection_params=conn_type, index_configs=[])
+        self.assertEqual(connector._qdrant_client, None, "connection created on init")
+        self.assertEqual(len(connector._check_collections()), 0, "collections exists on start")
+        self.assertNotEqual(connector._qdrant_client, None, "connection not created on first use")
+
+    def test_warmup(self):
+        """
+        test warmup connects and checks the configured indexes
+        :return:
+        """
+        conn_type = QdrantConnectionParams(conn_type=ConnType.MEMORY)
+        idx1 = IndexConfig(index_name="test1", config_data={'size': 10, 'distance': Distance.DOT})
+        idx2 = IndexConfig(index_name="test2", config_data={'size': 100, 'distance': Distance.COSINE})
+        connector = QdrantConnector(connection_params=conn_type, index_configs=[idx1, idx2])
+        connector.create_index(index_config=idx1)
+        self.assertEqual(connector.warmup(), {'test1': True, 'test2': False}, "wrong index state")
+        connector.drop_index(index_name="test1")
+
     def test__get_object_id(self):
         conn_type = QdrantConnectionParams(conn_type=ConnType.MEMORY)
         index_confs = []